@@ -10,7 +10,8 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 
 from utils.logger import LoggingMiddleware, set_project_name
-from api.routers import url
+from utils.profiler import PhaseStartMiddleware, PhaseEndMiddleware
+from api.routers import url, profiling
 from api.database import db_manager, init_db
 
 DATABASE_PATH = os.environ.get('DATABASE_PATH', 'urls.db')
@@ -67,13 +68,17 @@ app.add_exception_handler(RateLimitExceeded, custom_rate_limit_exceeded_handler)
 
 
 # 將 SlowAPIMiddleware 添加到應用程式，使其生效
+# 越晚加入的 middleware 越外層，前後兩個 Phase middleware 用來量測 rate_limit 階段
+app.add_middleware(PhaseEndMiddleware, name="rate_limit")
 app.add_middleware(SlowAPIMiddleware)
+app.add_middleware(PhaseStartMiddleware, name="rate_limit")
 app.add_middleware(LoggingMiddleware)                   
 
 
 
 # --- 所有 routers 集中在這邊進行管理 ---
 app.include_router(url.router)
+app.include_router(profiling.router)
 
 
 
@@ -0,0 +1,64 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from utils.profiler import profiler, PROFILER_MAX_SECONDS
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# --- 管理者驗證 ---
+def verify_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    FastAPI 依賴項，檢查 X-Admin-Token 標頭
+    未設定 PROFILING_ADMIN_TOKEN 時整個 profiling 介面視為關閉 (每次請求時讀取)
+    """
+    admin_token = os.getenv('PROFILING_ADMIN_TOKEN', '')
+    if not admin_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    # Starlette 以 latin-1 解碼標頭，用 latin-1 編碼回原始 bytes，再與 UTF-8 編碼的 token 比較
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode('latin-1'), admin_token.encode('utf-8')):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+router = APIRouter(
+    prefix="/admin/profiling",
+    tags=["Admin"],
+    dependencies=[Depends(verify_admin_token)],
+    include_in_schema=False
+)
+
+
+
+@router.post("/start", description='開始取樣 N 秒')
+async def start_profiling(seconds: int = Query(default=30, ge=1, le=PROFILER_MAX_SECONDS)):
+    try:
+        profiler.start(seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return profiler.status()
+
+
+
+# 使用 def，讓 FastAPI 在 threadpool 執行，避免 join 卡住 event loop
+@router.post("/stop", description='提前停止取樣')
+def stop_profiling():
+    profiler.stop()
+    return profiler.status()
+
+
+
+@router.get("/status", description='目前取樣狀態')
+async def profiling_status():
+    return profiler.status()
+
+
+
+@router.get("/stacks", response_class=PlainTextResponse, description='匯出 flamegraph 用的 collapsed stacks')
+async def profiling_stacks():
+    return PlainTextResponse(content=profiler.collapsed())
@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from api import models
 from api.database import get_db
 from api.cache import get_redis 
+from utils.profiler import phase_timer
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -54,8 +55,13 @@ async def create_short_url(
     ):
 
     try:
+        # 取得資料庫連線 (Session 為 lazy，這邊先取出連線以便分開量測)
+        with phase_timer("session_checkout"):
+            db_conn.connection()
+
         # 建構短 URL        
-        short_url = generate_short_code(db_conn=db_conn)
+        with phase_timer("query"):
+            short_url = generate_short_code(db_conn=db_conn)
 
         # 計算過期時間 (30天後)
         expiration_date = datetime.now() + timedelta(days=DEFAULT_EXPIRATION_DAYS)
@@ -72,7 +78,8 @@ async def create_short_url(
         )
 
         db_conn.add(new_url)
-        db_conn.commit()
+        with phase_timer("commit"):
+            db_conn.commit()
 
 
         # --- 寫入 Redis ---
@@ -83,7 +90,8 @@ async def create_short_url(
                 
                 # 因為 ex 一定要是正整數 所以這邊再多一個判斷
                 if remaining_seconds > 0:
-                    redis_conn.set(short_url, original_url_str, ex=remaining_seconds)
+                    with phase_timer("cache_set"):
+                        redis_conn.set(short_url, original_url_str, ex=remaining_seconds)
 
             except redis.RedisError as e:
                 # 如果 Redis 寫入失敗，只記錄錯誤，不影響主要流程，在不使用 Redis 也可以正常運行
@@ -118,7 +126,8 @@ async def redirect_to_original(
         # --- 檢查 Redis ---
         if redis_conn:
             try:
-                cached_original_url = redis_conn.get(short_url)
+                with phase_timer("cache_get"):
+                    cached_original_url = redis_conn.get(short_url)
                 if cached_original_url:
                     print(f"Redis 有: {short_url}")
                     # 直接從 Redis 重定向
@@ -135,8 +144,13 @@ async def redirect_to_original(
 
     
         # --- Redis 未出現或 Redis 不可用，查詢資料庫 ---
+        # 取得資料庫連線 (Session 為 lazy，這邊先取出連線以便分開量測)
+        with phase_timer("session_checkout"):
+            db_conn.connection()
+
         # 查找短碼 使用 ORM 查詢資料
-        url_data = db_conn.query(models.URL).filter(models.URL.short_url == short_url).first()
+        with phase_timer("query"):
+            url_data = db_conn.query(models.URL).filter(models.URL.short_url == short_url).first()
 
         # 檢查是否存在
         if not url_data:
@@ -153,7 +167,8 @@ async def redirect_to_original(
                 remaining_seconds = int((expiration_date - datetime.now()).total_seconds())
                 
                 if remaining_seconds > 0:
-                    redis_conn.set(short_url, original_url, ex=remaining_seconds)
+                    with phase_timer("cache_set"):
+                        redis_conn.set(short_url, original_url, ex=remaining_seconds)
 
             except redis.RedisError as e:
                 # 如果快取寫入失敗，只記錄錯誤，不影響主要流程，在不使用 Redis 也可以正常運行
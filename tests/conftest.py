@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# api.database / utils.logger 在 import 時就讀取環境變數，必須先設定好再載入 app
+_TMP_DIR = tempfile.mkdtemp(prefix='shorten_url_test_')
+os.environ['SQLITE_DATABASE_PATH'] = os.path.join(_TMP_DIR, 'urls.db')
+os.environ['LOG_DIR'] = os.path.join(_TMP_DIR, 'logs')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from api.main import app, limiter
+from utils.profiler import profiler
+
+
+@pytest.fixture
+def client():
+    limiter.reset() # 避免測試之間累積速率限制次數
+    with TestClient(app) as test_client:
+        yield test_client
+    profiler.stop()
@@ -0,0 +1,186 @@
+import json
+import logging
+import threading
+
+from api.main import PROJECT_NAME
+from utils import profiler as profiler_module
+from utils.profiler import phase_timer, phase_recording, _current_recorder, _NULL_TIMER, PhaseRecorder, SamplingProfiler
+
+ADMIN_TOKEN = 's3cret'
+ADMIN_HEADERS = {'X-Admin-Token': ADMIN_TOKEN}
+
+
+# --- 管理者驗證 ---
+def test_admin_endpoints_return_404_without_configured_token(client, monkeypatch):
+    monkeypatch.delenv('PROFILING_ADMIN_TOKEN', raising=False)
+
+    assert client.get('/admin/profiling/status', headers=ADMIN_HEADERS).status_code == 404
+    assert client.post('/admin/profiling/start', headers=ADMIN_HEADERS).status_code == 404
+
+
+def test_admin_endpoints_return_403_for_wrong_token(client, monkeypatch):
+    monkeypatch.setenv('PROFILING_ADMIN_TOKEN', ADMIN_TOKEN)
+
+    assert client.get('/admin/profiling/status').status_code == 403
+    assert client.get('/admin/profiling/status', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    # 非 ASCII 的標頭不可造成 500
+    assert client.get('/admin/profiling/status', headers={'X-Admin-Token': 't\xf6k'.encode('latin-1')}).status_code == 403
+
+
+def test_non_ascii_admin_token_matches_utf8_header(client, monkeypatch):
+    monkeypatch.setenv('PROFILING_ADMIN_TOKEN', 'tök')
+
+    assert client.get('/admin/profiling/status', headers={'X-Admin-Token': 'tök'.encode('utf-8')}).status_code == 200
+
+
+def test_second_start_returns_409(client, monkeypatch):
+    monkeypatch.setenv('PROFILING_ADMIN_TOKEN', ADMIN_TOKEN)
+
+    response = client.post('/admin/profiling/start?seconds=5', headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()['running'] is True
+
+    assert client.post('/admin/profiling/start?seconds=5', headers=ADMIN_HEADERS).status_code == 409
+
+    response = client.post('/admin/profiling/stop', headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()['running'] is False
+
+
+def test_stacks_are_collapsed_format(client, monkeypatch):
+    monkeypatch.setenv('PROFILING_ADMIN_TOKEN', ADMIN_TOKEN)
+
+    client.post('/admin/profiling/start?seconds=5', headers=ADMIN_HEADERS)
+    client.get('/')
+    response = client.post('/admin/profiling/stop', headers=ADMIN_HEADERS)
+    # 取樣執行緒至少會取樣一次，就算 stop 比它先執行
+    assert response.json()['samples'] > 0
+
+    response = client.get('/admin/profiling/stacks', headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert ';' in stack
+        assert count.isdigit() and int(count) > 0
+
+
+# --- 慢請求 Log ---
+def _slow_request_entries(caplog):
+    entries = [json.loads(record.getMessage()) for record in caplog.records
+               if record.name == PROJECT_NAME and record.levelno == logging.WARNING]
+    return [entry for entry in entries if entry.get('type') == 'slow_request']
+
+
+def test_slow_request_logged_with_phases(client, monkeypatch, caplog):
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', '0.001')
+
+    response = client.post('/url/create_short_url', json={'original_url': 'https://example.com/'})
+    assert response.status_code == 201
+    short_url = response.json()['short_url']
+
+    response = client.get('/url/redirect_to_original', params={'short_url': short_url}, follow_redirects=False)
+    assert response.status_code == 302
+
+    entries = {entry['path']: entry for entry in _slow_request_entries(caplog)}
+
+    create_phases = entries['/url/create_short_url']['phases_ms']
+    assert {'rate_limit', 'session_checkout', 'query', 'commit', 'log_write'} <= set(create_phases)
+
+    redirect = entries['/url/redirect_to_original']
+    # Redis 不可用時只會走資料庫，所以不檢查 cache_get
+    assert {'rate_limit', 'log_write'} <= set(redirect['phases_ms'])
+    # 各階段總和不可超過總花費時間
+    assert sum(redirect['phases_ms'].values()) <= redirect['total_duration'] * 1000
+
+
+def test_rate_limited_request_closes_rate_limit_phase(client, monkeypatch, caplog):
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', '0.001')
+
+    recorders = []
+
+    class TrackingRecorder(PhaseRecorder):
+        def __init__(self):
+            super().__init__()
+            recorders.append(self)
+
+    monkeypatch.setattr(profiler_module, 'PhaseRecorder', TrackingRecorder)
+
+    # 預設每分鐘 60 次，第 61 次會被擋下
+    for _ in range(61):
+        response = client.get('/')
+    assert response.status_code == 429
+
+    entry = _slow_request_entries(caplog)[-1]
+    assert entry['status_code'] == 429
+    assert 'rate_limit' in entry['phases_ms']
+    assert recorders[-1]._opened == {}
+
+
+def test_invalid_threshold_disables_recording(client, monkeypatch, caplog, capsys):
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', '200ms')
+
+    assert client.get('/').status_code == 200
+    assert client.get('/').status_code == 200
+
+    assert _slow_request_entries(caplog) == []
+    assert capsys.readouterr().out.count('SLOW_REQUEST_THRESHOLD_MS') == 1
+
+
+def test_recorder_is_reset_after_request(client, monkeypatch):
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', '0.001')
+
+    with phase_recording() as recorder:
+        assert _current_recorder.get() is recorder
+    assert _current_recorder.get() is None
+
+    client.get('/')
+    assert _current_recorder.get() is None
+
+
+def test_no_slow_request_log_below_threshold(client, monkeypatch, caplog):
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', '60000')
+
+    client.get('/')
+
+    assert _slow_request_entries(caplog) == []
+
+
+# --- phase_timer ---
+def test_phase_timer_is_noop_when_recording_disabled(monkeypatch):
+    monkeypatch.delenv('SLOW_REQUEST_THRESHOLD_MS', raising=False)
+
+    with phase_recording() as recorder:
+        assert recorder is None
+        assert phase_timer('query') is _NULL_TIMER
+
+
+# --- SamplingProfiler ---
+def test_deep_stack_keeps_root_frames(monkeypatch):
+    monkeypatch.setattr(profiler_module, 'PROFILER_MAX_DEPTH', 5)
+    ready = threading.Event()
+    release = threading.Event()
+
+    def recurse(depth):
+        if depth == 0:
+            ready.set()
+            release.wait()
+        else:
+            recurse(depth - 1)
+
+    thread = threading.Thread(target=recurse, args=(20,), name='deep-thread')
+    thread.start()
+    ready.wait()
+    try:
+        sampler = SamplingProfiler()
+        sampler.sample_once()
+    finally:
+        release.set()
+        thread.join()
+
+    stack = next(stack for stack in sampler.stacks if stack.startswith('deep-thread;')).split(';')
+    assert stack[1].startswith('_bootstrap ')
+    assert stack[-1] == '[truncated]'
+    assert len(stack) == 1 + 5 + 1
@@ -9,6 +9,8 @@ from starlette.responses import Response, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from pathlib import Path
 
+from utils.profiler import phase_timer, phase_recording, is_slow_request
+
 # 專案名稱由外部設定
 PROJECT_NAME = "default_project"  # 預設值，會由 main.py 改變
 logger = None  # 初始化 Logger 變數
@@ -92,12 +94,18 @@ async def log_request(request: Request, response: Response, request_json, reques
 #  自訂中介層 (Middleware) 來記錄請求
 class LoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
+        # 慢請求門檻開啟時才會紀錄各階段耗時，請求結束 (含寫 Log) 後還原
+        with phase_recording() as recorder:
+            return await self._dispatch(request, call_next, recorder)
+
+    async def _dispatch(self, request: Request, call_next, recorder):
         request_datetime = datetime.now()
         request_time = request_datetime.strftime('%Y-%m-%d %H:%M:%S.%f') # 紀錄請求時間
 
         # 若使用POST，須把request的JSON內容取出，寫入LOG
         # 若不使用POST，須把request的JSON內容取出，寫入LOG
-        if request.method == 'POST' :
+        # 沒有 body 的 POST (例如 /admin/profiling/start) 不解析 JSON
+        if request.method == 'POST' and await request.body():
             request_json = await request.json()
         else :
             request_json = ""
@@ -109,6 +117,25 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 
         total_duration = (response_datetime-request_datetime).total_seconds() # 紀錄花費時間
 
-        request_id, new_response = await log_request(request, response, request_json, request_time, response_time, total_duration)  # 記錄請求，獲取 UUID
+        with phase_timer("log_write"):
+            request_id, new_response = await log_request(request, response, request_json, request_time, response_time, total_duration)  # 記錄請求，獲取 UUID
+
+        # 超過門檻的請求額外寫一筆慢請求 Log，附上各階段耗時 (毫秒)
+        # 這邊的花費時間在寫完 Log 之後才計算，才會包含 log_write 階段
+        if recorder is not None and logger is not None:
+            slow_total_duration = (datetime.now()-request_datetime).total_seconds()
+            if is_slow_request(slow_total_duration):
+                slow_data = {
+                    "type": "slow_request",
+                    "uuid": request_id,
+                    "request_time": request_time,
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status_code": response.status_code,
+                    "total_duration": slow_total_duration,
+                    "phases_ms": recorder.as_ms()
+                }
+                logger.warning(json.dumps(slow_data, ensure_ascii=False))
+
         new_response.headers["X-Request-ID"] = request_id  # 在回應標頭中加入 UUID
         return new_response
\ No newline at end of file
@@ -0,0 +1,276 @@
+import os
+import sys
+import math
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# 取樣式 profiler 的限制
+PROFILER_MAX_SECONDS = int(os.getenv('PROFILER_MAX_SECONDS', 300))
+PROFILER_INTERVAL_SECONDS = float(os.getenv('PROFILER_INTERVAL_SECONDS', 0.005))
+PROFILER_MAX_DEPTH = 128
+
+
+# --- 各階段耗時紀錄 (rate_limit / cache_get / session_checkout / query / commit / log_write) ---
+class PhaseRecorder:
+    """紀錄單一請求內各階段花費的時間 (秒)，同名階段會累加"""
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._opened: Dict[str, float] = {}
+
+    def add(self, name: str, duration: float):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def open(self, name: str):
+        """開始一個跨 middleware 的階段，由 close 結束"""
+        self._opened[name] = time.perf_counter()
+
+    def close(self, name: str):
+        """結束 open 開始的階段，重複呼叫或未 open 時忽略"""
+        start = self._opened.pop(name, None)
+        if start is not None:
+            self.add(name, time.perf_counter() - start)
+
+    def as_ms(self) -> Dict[str, float]:
+        """轉成毫秒，方便寫入 Log"""
+        return {name: round(duration * 1000, 3) for name, duration in self.phases.items()}
+
+
+# 每個請求自己的 recorder，沒有開啟慢請求紀錄時為 None
+_current_recorder: ContextVar[Optional[PhaseRecorder]] = ContextVar('phase_recorder', default=None)
+
+
+class _PhaseTimer:
+    """量測一個階段的 context manager"""
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder: PhaseRecorder, name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """沒有 recorder 時使用，什麼都不做"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def phase_timer(name: str):
+    """
+    量測某個階段的耗時，例如 `with phase_timer("query"): ...`
+    關閉時只多一次 ContextVar 讀取，幾乎沒有額外成本
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return _NULL_TIMER
+    return _PhaseTimer(recorder, name)
+
+
+# 已經提示過的錯誤門檻設定，避免每個請求都印一次
+_invalid_thresholds = set()
+
+
+def get_slow_request_threshold_ms() -> float:
+    """
+    慢請求門檻 (毫秒)，0 或未設定代表關閉慢請求紀錄，每次呼叫時讀取環境變數
+    設定值無法解析時視為關閉，不可影響正常請求
+    """
+    raw_value = os.getenv('SLOW_REQUEST_THRESHOLD_MS') or '0'
+    try:
+        threshold_ms = float(raw_value)
+        if not math.isfinite(threshold_ms):
+            raise ValueError(f"not a finite number: {raw_value}")
+    except ValueError:
+        if raw_value not in _invalid_thresholds:
+            _invalid_thresholds.add(raw_value)
+            print(f"SLOW_REQUEST_THRESHOLD_MS 設定錯誤 ({raw_value!r})，關閉慢請求紀錄")
+        return 0.0
+    return threshold_ms
+
+
+@contextmanager
+def phase_recording():
+    """
+    在 middleware 內使用，門檻未開啟時回傳 None
+    離開時還原 ContextVar，避免請求結束後的程式碼繼續寫入這個 recorder
+    """
+    if get_slow_request_threshold_ms() <= 0:
+        yield None
+        return
+
+    recorder = PhaseRecorder()
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def is_slow_request(total_duration: float) -> bool:
+    """total_duration 單位為秒"""
+    threshold_ms = get_slow_request_threshold_ms()
+    return threshold_ms > 0 and total_duration * 1000 >= threshold_ms
+
+
+# --- 量測其他 middleware 的階段 (例如 SlowAPIMiddleware 的速率限制檢查) ---
+class PhaseStartMiddleware:
+    """
+    放在目標 middleware 外層，請求進入時開始計時
+    目標 middleware 直接回應 (例如 429) 時，在開始送出回應時結束計時
+    (外層的 LoggingMiddleware 收到回應開頭就會寫 Log，不能等到整個回應送完)
+    """
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        recorder = _current_recorder.get()
+        if recorder is None or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                recorder.close(self.name)
+            await send(message)
+
+        recorder.open(self.name)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            recorder.close(self.name)
+
+
+class PhaseEndMiddleware:
+    """放在目標 middleware 內層，請求通過目標 middleware 後結束計時"""
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        recorder = _current_recorder.get()
+        if recorder is not None:
+            recorder.close(self.name)
+        await self.app(scope, receive, send)
+
+
+# --- 取樣式 Profiler ---
+class SamplingProfiler:
+    """
+    以背景執行緒定期讀取所有執行緒的 stack (sys._current_frames)，
+    輸出 flamegraph.pl / speedscope 可讀的 collapsed stack 格式
+    """
+    def __init__(self, interval: float = PROFILER_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration: float = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float):
+        """開始取樣 duration 秒，時間到自動停止"""
+        if self.running:
+            raise RuntimeError("Profiler 已在執行中")
+
+        with self._lock:
+            self.stacks = Counter()
+            self.samples = 0
+        self.duration = duration
+        self.started_at = time.time()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(duration,), name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """提前停止取樣，已收集的資料會保留 (會等待取樣執行緒結束，請勿在 event loop 中呼叫)"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self, duration: float):
+        # 至少取樣一次，避免 stop 比執行緒先執行時完全沒有資料
+        deadline = time.perf_counter() + duration
+        while True:
+            self.sample_once()
+            if self._stop_event.wait(self.interval) or time.perf_counter() >= deadline:
+                break
+
+    def sample_once(self):
+        """讀取一次所有執行緒的 stack (profiler 執行緒本身除外)"""
+        own_ident = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        frames = sys._current_frames()
+
+        collected = []
+        for ident, frame in frames.items():
+            if ident == own_ident:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.reverse()  # collapsed 格式由 root 開始
+
+            # 太深時保留外層 frame，截掉最內層並加上標記，避免 flamegraph 的 root 錯位
+            if len(stack) > PROFILER_MAX_DEPTH:
+                stack = stack[:PROFILER_MAX_DEPTH] + ['[truncated]']
+
+            stack.insert(0, thread_names.get(ident, str(ident)))
+            collected.append(';'.join(stack))
+
+        with self._lock:
+            self.stacks.update(collected)
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """每行一個 stack：`root;child;leaf <次數>`"""
+        with self._lock:
+            return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def status(self) -> dict:
+        with self._lock:
+            samples = self.samples
+            unique_stacks = len(self.stacks)
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": samples,
+            "unique_stacks": unique_stacks,
+        }
+
+
+# 全域 profiler 實例，由 admin router 控制
+profiler = SamplingProfiler()